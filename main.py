@@ -1,26 +1,20 @@
-import os
+import json
 import sys
+import time
 from pathlib import Path
 
 import matplotlib.pyplot as plt
-
-# Add the src directory to the Python path
-sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "src")))
-sys.path.append(os.path.join(os.path.dirname(__file__), "src"))
-
-import json
-import time
-
-from scipy.spatial import distance
 from termcolor import colored
 
-from rl.env import CVRPEnv
+from src.rl.env import CVRPEnv
+from src.rl.parallel import train_parallel
 from src.rl.q_learning import QLearningAgent
+from src.rl.training import run_episode
 from src.utils import parse_solution_file, parse_vrp_file, plot_route
 
 
 # Load configuration from the rl folder
-config_path = Path(__file__).resolve().parent / "rl" / "config.json"
+config_path = Path(__file__).resolve().parent / "src" / "rl" / "config.json"
 with open(config_path, "r") as config_file:
     config = json.load(config_file)
 
@@ -28,11 +22,12 @@ with open(config_path, "r") as config_file:
 n_episodes = config["n_episodes"]
 learning_rate = config["learning_rate"]
 discount_factor = config["discount_factor"]
+n_workers = config.get("n_workers", 1)
 
 print(colored("Starting CVRP solver...", "green"))
 
 # Get the project root directory (parent of src)
-project_root = Path(__file__).resolve().parent.parent
+project_root = Path(__file__).resolve().parent
 print(f"Project root: {project_root}")
 
 # Load and parse data
@@ -65,102 +60,75 @@ demands = {i: demands[node_id] for i, node_id in enumerate(demands.keys())}
 
 depot_id = 0  # Assuming the depot is the first node
 
-# Calculate distances between all nodes
 num_nodes = len(coords)
-distances = [[0] * num_nodes for _ in range(num_nodes)]
-node_keys = list(coords.keys())  # Get the keys of the nodes
-
-for i in range(num_nodes):
-    for j in range(num_nodes):
-        if i != j:
-            node_i = node_keys[i]
-            node_j = node_keys[j]
-            distances[i][j] = distance.euclidean(coords[node_i], coords[node_j])
 
-# Update instance_data with calculated distances
+# Distances between nodes are computed by the environment
 instance_data = {
     "nodes": coords,
     "demands": demands,
     "depot_id": depot_id,
     "capacity": capacity,
-    "distances": distances,  # Include calculated distances
     "optimal_routes": optimal_routes,
     "optimal_distance": optimal_distance,
 }
 
-env = CVRPEnv(instance_data)
-agent = QLearningAgent()
-
 # Training loop
 best_distance = float("inf")
 best_route = None
+best_distances = []  # Best distance after each episode, or each parallel round
 print(f"\nStarting training for {n_episodes} episodes...")
 
-for episode in range(n_episodes):
-    state = env.reset()
-    total_reward = 0
-    done = False
-    moves_this_episode = 0
-    episode_start_time = time.time()
-
-    # Print episode start status
-    print(f"Episode {episode + 1}/{n_episodes}, Moves: 0", end="\r", flush=True)
-
-    while not done:
-        # Get valid moves and choose action
-        valid_moves = env.get_valid_moves()
-        action = agent.choose_action(state, valid_moves)
-
-        # Take action
-        next_state, reward, done = env.step(action)
-
-        # Get valid moves for next state
-        next_valid_moves = env.get_valid_moves() if not done else []
-
-        # Update Q-values
-        agent.update(state, action, reward, next_state, next_valid_moves)
-
-        total_reward += reward
-        state = next_state
-        moves_this_episode += 1
-
-        # Update progress on the same line
-        print(
-            f"Episode {episode + 1}/{n_episodes}, Moves: {moves_this_episode}, Last action: {action}",
-            end="\r",
-            flush=True,
-        )
-
-    # Get final route and distance
-    route, distance = env.render_route()
-    episode_time = time.time() - episode_start_time
-
-    # Update best solution
-    if distance < best_distance:
-        best_distance = distance
-        best_route = route.copy()
-        print(f"New best solution! Distance: {distance:.2f}", end=" ")
-        if optimal_distance:
-            gap = ((distance - optimal_distance) / optimal_distance) * 100
-            print(f"(Gap: {gap:.2f}%)")
-        else:
-            print()
-
-    # Decay exploration rate
-    agent.decay_epsilon()
-
-    # Print detailed progress every 10 episodes
-    if (episode + 1) % 100 == 0:
-        stats = agent.get_statistics()
-        print(f"\nProgress after {episode + 1} episodes:")
-        print(
-            f"epsilon: {stats['epsilon']:.3f} | Actions: {stats['total_actions']} | Q-table: {stats['q_table_size']}"
-        )
-        print(f"Current: {distance:.2f} | Best: {best_distance:.2f}", end=" ")
-        if optimal_distance:
-            gap = ((best_distance - optimal_distance) / optimal_distance) * 100
-            print(f"| Gap: {gap:.2f}%")
-        print("-" * 50)
+if n_workers > 1:
+    # Workers train on Q-table snapshots that are merged after every round
+    print(f"Using {n_workers} parallel workers")
+    _, _, best_distance, best_route, best_distances = train_parallel(
+        instance_data,
+        n_episodes,
+        n_workers,
+        learning_rate=learning_rate,
+        discount_factor=discount_factor,
+    )
+else:
+    env = CVRPEnv(instance_data)
+    agent = QLearningAgent(
+        num_nodes, learning_rate=learning_rate, discount_factor=discount_factor
+    )
+    last_progress_time = 0.0  # Progress line is redrawn at most every 0.2 seconds
+
+    for episode in range(n_episodes):
+        distance, moves, route = run_episode(env, agent, best_distance)
+
+        # Update progress on the same line, throttled to spare the terminal
+        now = time.perf_counter()
+        if now - last_progress_time > 0.2:
+            sys.stdout.write(f"Episode {episode + 1}/{n_episodes}, Moves: {moves}\r")
+            sys.stdout.flush()
+            last_progress_time = now
+
+        # Update best solution
+        if route is not None:
+            best_distance = distance
+            best_route = route
+            print(f"New best solution! Distance: {distance:.2f}", end=" ")
+            if optimal_distance:
+                gap = ((distance - optimal_distance) / optimal_distance) * 100
+                print(f"(Gap: {gap:.2f}%)")
+            else:
+                print()
+        best_distances.append(best_distance)
+
+        # Print detailed progress every 10 episodes
+        if (episode + 1) % 100 == 0:
+            stats = agent.get_statistics()
+            print(f"\nProgress after {episode + 1} episodes:")
+            print(
+                f"epsilon: {stats['epsilon']:.3f} | Actions: {stats['total_actions']} | Q-table: {stats['q_table_size']}"
+            )
+            print(f"Current: {distance:.2f} | Best: {best_distance:.2f}", end=" ")
+            if optimal_distance:
+                gap = ((best_distance - optimal_distance) / optimal_distance) * 100
+                print(f"| Gap: {gap:.2f}%")
+            print("-" * 50)
 
 print("\nTraining completed!")
 print(f"Best distance found: {best_distance:.2f}")
@@ -168,9 +136,13 @@ if optimal_distance:
     final_gap = ((best_distance - optimal_distance) / optimal_distance) * 100
     print(f"Final gap to optimal: {final_gap:.2f}%")
 
+if best_route is None:
+    print("Error: No training episodes were run, there is no solution to show")
+    sys.exit(1)
+
 # Get final solution
 print("\nGenerating final solution...")
-learned_route, total_distance = env.render_route()
+learned_route, total_distance = best_route, best_distance
 
 # Print final routes
 print("\nFinal Routes found by RL agent:")
@@ -250,6 +222,17 @@ else:
 plt.tight_layout()
 print("\nSaving plot to 'cvrp_rl_comparison.png'...")
 plt.savefig("cvrp_rl_comparison.png")
+
+# Plot minimization progress
+if best_distances:
+    plt.figure(figsize=(10, 5))
+    plt.plot(best_distances, label="Best Distance")
+    plt.xlabel("Round" if n_workers > 1 else "Episode")
+    plt.ylabel("Distance")
+    plt.title("Minimization Progress")
+    plt.legend()
+    plt.grid(True)
+
 plt.show()
 
 print("\nDone!")
@@ -1,29 +1,6 @@
-from src.utils import euclidean_distance
-import json
-from pathlib import Path
-import matplotlib.pyplot as plt
-from colored import fg, attr
+import numpy as np
 
-# Define project_root based on the current file's location
-project_root = Path(__file__).resolve().parent.parent
-
-# Load configuration
-config_path = Path(__file__).resolve().parent / "config.json"
-with open(config_path, "r") as config_file:
-    config = json.load(config_file)
-
-# Use config parameters
-instance_name = config["instance_name"]
-n_episodes = config["n_episodes"]
-capacity = config["capacity"]
-depot_id = config["depot_id"]
-
-# Example of colored print
-print(f"{fg('green')}Starting CVRP solver...{attr('reset')}")
-print(f"{fg('blue')}Project root: {project_root}{attr('reset')}")
-print(f"{fg('yellow')}Loading problem instance: {instance_name}{attr('reset')}")
-
-best_distances = []
+from src.utils import get_distance_matrix
 
 
 class CVRPEnv:
@@ -33,90 +10,117 @@ class CVRPEnv:
         """Initialize the CVRP environment."""
         # Extract data from instance
         self.nodes = instance_data["nodes"]
-        self.demands = instance_data["demands"]
         self.depot_id = instance_data["depot_id"]
         self.capacity = instance_data["capacity"]
-        self.distances = instance_data["distances"]
         self.optimal_routes = instance_data.get("optimal_routes", None)
         self.optimal_distance = instance_data.get("optimal_distance", float("inf"))
 
+        # Node data as arrays indexed by node id
+        num_nodes = len(self.nodes)
+        self.demands = np.asarray(
+            [instance_data["demands"][i] for i in range(num_nodes)], dtype=np.int32
+        )
+        self.distances = get_distance_matrix(self.nodes).astype(np.float32)
+        self._bit = [1 << node for node in range(num_nodes)]  # State bitmask per node
+
+        # Bit offsets of the state fields packed into a single int
+        self._load_shift = (num_nodes - 1).bit_length()
+        self._unvisited_shift = self._load_shift + int(self.capacity).bit_length()
+        self._at_depot_shift = self._unvisited_shift + num_nodes
+        self._route_tail_shift = self._at_depot_shift + 1
+
+        # Templates for the start-of-episode state
+        self._init_unvisited_mask = sum(self._bit) & ~self._bit[self.depot_id]
+        self._init_remaining = np.flatnonzero(np.arange(num_nodes) != self.depot_id)
+
         # State variables
         self.current_node = self.depot_id
-        self.unvisited = set(self.nodes.keys()) - {self.depot_id}
+        self._remaining = self._init_remaining  # Unvisited customers
+        self._unvisited_mask = self._init_unvisited_mask
+        self._route_tail_mask = 0  # Nodes visited since last depot
         self.current_load = 0
         self.current_route = [self.depot_id]
         self.all_routes = []
         self.total_distance = 0
         self.last_depot_visit_idx = 0  # Index of last depot visit in current route
+        self._cached_valid = None  # Valid moves for the current state
         self.best_solution = {"routes": [], "distance": float("inf")}
 
     def get_state(self):
         """Convert current environment state to a hashable representation."""
-        unvisited_tuple = tuple(sorted(self.unvisited))
-        current_route = self.current_route[self.last_depot_visit_idx :]
-        current_route_tuple = tuple(current_route)
-        at_depot = self.current_node == self.depot_id
+        current_node = int(self.current_node)
+        at_depot = current_node == self.depot_id
         return (
-            self.current_node,
-            unvisited_tuple,
-            self.current_load,
-            current_route_tuple,
-            at_depot,
+            current_node
+            | self.current_load << self._load_shift
+            | self._unvisited_mask << self._unvisited_shift
+            | at_depot << self._at_depot_shift
+            | self._route_tail_mask << self._route_tail_shift
         )
 
     def get_valid_moves(self):
         """Get list of valid next moves from current state."""
-        valid_moves = []
+        if self._cached_valid is not None:
+            return self._cached_valid
 
-        # Check if we can visit any unvisited nodes
-        for node in self.unvisited:
-            if self.current_load + self.demands[node] <= self.capacity:
-                valid_moves.append(node)
+        # Unvisited nodes whose demand still fits in the vehicle
+        remaining = self._remaining
+        valid_moves = remaining[
+            self.demands[remaining] <= self.capacity - self.current_load
+        ]
 
         # Determine if returning to depot is valid
-        nodes_visited_since_depot = (
-            len(self.current_route) - self.last_depot_visit_idx - 1
-        )
         can_return_to_depot = (
             self.current_node != self.depot_id  # Not already at depot
-            and nodes_visited_since_depot > 0  # Visited some nodes since last depot
-            and (
-                not valid_moves or not self.unvisited
-            )  # Can't add more nodes or all nodes visited
+            and self._route_tail_mask != 0  # Visited some nodes since last depot
+            and valid_moves.size == 0  # Can't add more nodes or all nodes visited
         )
 
         if can_return_to_depot:
-            valid_moves.append(self.depot_id)
+            valid_moves = np.append(valid_moves, self.depot_id)
 
+        self._cached_valid = valid_moves
         return valid_moves
 
     def step(self, action):
-        """Execute action and return new state, reward, done."""
-        if action not in self.get_valid_moves():
-            return self.get_state(), -1000, True  # Invalid action penalty
+        """Execute action and return new state, reward, done and next valid moves."""
+        if action is None or not 0 <= action < len(self.demands):
+            invalid = True  # No valid move was available, or unknown node
+        elif action == self.depot_id:
+            invalid = self._route_tail_mask == 0  # Nothing visited since last depot
+        else:
+            invalid = not self._unvisited_mask & self._bit[action] or (
+                self.demands[action] > self.capacity - self.current_load
+            )
+        if invalid:
+            return self.get_state(), -1000, True, None  # Invalid action penalty
 
         # Commenting out debug prints
         # print(f"Current node: {self.current_node}, Action: {action}")
         # print(f"Number of nodes: {len(self.nodes)}")
 
         # Calculate distance for this step
-        distance = self.distances[self.current_node][action]
+        distance = float(self.distances[self.current_node, action])
         self.total_distance += distance
 
         # Update current position and load
         self.current_node = action
         if action != self.depot_id:
-            self.current_load += self.demands[action]
-            self.unvisited.remove(action)
+            self.current_load += int(self.demands[action])
+            self._remaining = self._remaining[self._remaining != action]
+            self._unvisited_mask &= ~self._bit[action]
+            self._route_tail_mask |= self._bit[action]
         else:
             self.current_load = 0
             self.last_depot_visit_idx = len(self.current_route)
+            self._route_tail_mask = 0
 
         # Update route
         self.current_route.append(action)
+        self._cached_valid = None
 
         # Check if solution is complete
-        done = len(self.unvisited) == 0 and self.current_node == self.depot_id
+        done = self._remaining.size == 0 and self.current_node == self.depot_id
 
         if done:
             # Complete solution found
@@ -127,27 +131,25 @@ class CVRPEnv:
                     "routes": self.all_routes.copy(),
                     "distance": self.total_distance,
                 }
-            if distance < best_distance:
-                best_distance = distance
-                best_route = self.current_route.copy()
-                best_distances.append(best_distance)
-            else:
-                best_distances.append(best_distance)
         else:
             # Intermediate reward based on local improvement
             reward = -distance  # Negative distance as immediate cost
 
-        return self.get_state(), reward, done
+        next_valid_moves = None if done else self.get_valid_moves()
+        return self.get_state(), reward, done, next_valid_moves
 
     def reset(self):
         """Reset environment to initial state."""
         self.current_node = self.depot_id
-        self.unvisited = set(self.nodes.keys()) - {self.depot_id}
+        self._remaining = self._init_remaining
+        self._unvisited_mask = self._init_unvisited_mask
+        self._route_tail_mask = 0
         self.current_load = 0
         self.current_route = [self.depot_id]
         self.all_routes = []
         self.total_distance = 0
         self.last_depot_visit_idx = 0
+        self._cached_valid = None
         return self.get_state()
 
     def get_solution(self):
@@ -170,16 +172,12 @@ class CVRPEnv:
         else:
             complete_route = [self.depot_id]  # Handle empty solution case
 
-        total_distance = sum(
-            self._calculate_distance(complete_route[i], complete_route[i + 1])
-            for i in range(len(complete_route) - 1)
-        )
-
-        return complete_route, total_distance
+        # Distance was already accumulated step by step
+        return complete_route, self.total_distance
 
     def _calculate_distance(self, node1, node2):
-        """Calculate Euclidean distance between two nodes."""
-        return euclidean_distance(self.nodes[node1], self.nodes[node2])
+        """Look up the precomputed distance between two nodes."""
+        return float(self.distances[node1, node2])
 
     def get_total_distance(self):
         """Calculate total distance of all routes."""
@@ -233,7 +231,7 @@ class CVRPEnv:
             total_demand += route_demand
 
         # Check if all clients are visited
-        if visited_clients != set(self.demands.keys()):
+        if visited_clients != set(range(len(self.demands))):
             valid = False
 
         if not valid:
@@ -241,14 +239,3 @@ class CVRPEnv:
             return -1000
 
         return 1000 / self.total_distance  # Reward valid solution
-
-
-# Plot minimization progress
-plt.figure(figsize=(10, 5))
-plt.plot(best_distances, label="Best Distance")
-plt.xlabel("Episode")
-plt.ylabel("Distance")
-plt.title("Minimization Progress")
-plt.legend()
-plt.grid(True)
-plt.show()
@@ -0,0 +1,106 @@
+import numpy as np
+from joblib import Parallel, delayed
+
+from src.rl.env import CVRPEnv
+from src.rl.q_learning import QLearningAgent
+from src.rl.training import run_episode
+
+
+def run_episodes(instance_data, n_episodes, q_table, epsilon, seed, agent_params):
+    """Train a local agent from a Q-table snapshot and return what it learned."""
+    env = CVRPEnv(instance_data)
+    agent = QLearningAgent(
+        len(instance_data["nodes"]), epsilon=epsilon, seed=seed, **agent_params
+    )
+    agent.q_table = q_table  # Each worker receives its own unpickled copy
+
+    best_distance = float("inf")
+    best_route = None
+    for _ in range(n_episodes):
+        distance, _, route = run_episode(env, agent, best_distance)
+        if route is not None:
+            best_distance = distance
+            best_route = route
+
+    return agent.q_table, agent.epsilon, best_distance, best_route
+
+
+def merge_q_tables(q_tables):
+    """Average Q-value rows element-wise over the tables that contain each state."""
+    merged = {}
+    counts = {}
+    for q_table in q_tables:
+        for state, q_row in q_table.items():
+            if state in merged:
+                merged[state] += q_row
+                counts[state] += 1
+            else:
+                merged[state] = q_row.copy()
+                counts[state] = 1
+
+    for state, count in counts.items():
+        if count > 1:
+            merged[state] /= count
+
+    return merged
+
+
+def train_parallel(
+    instance_data,
+    n_episodes,
+    n_workers,
+    sync_every=100,
+    seed=None,
+    learning_rate=0.1,
+    discount_factor=0.95,
+):
+    """Train over n_workers processes, merging their Q-tables every sync_every episodes.
+
+    The n_episodes are split as evenly as possible between the workers.
+    learning_rate and discount_factor are passed to each worker's agent.
+    Returns the merged Q-table, the decayed exploration rate, the best
+    distance and route found by any worker, and the best distance after
+    each round.
+    """
+    rng = np.random.default_rng(seed)
+    agent_params = {"learning_rate": learning_rate, "discount_factor": discount_factor}
+    # Episodes per worker, the remainder goes to the first workers
+    quotas = [
+        n_episodes // n_workers + (worker < n_episodes % n_workers)
+        for worker in range(n_workers)
+    ]
+    sync_every = max(1, min(sync_every, quotas[0]))
+    n_rounds = -(-quotas[0] // sync_every)  # Ceiling division
+    q_table = {}
+    epsilon = 1.0
+    best_distance = float("inf")
+    best_route = None
+    best_distances = []  # Best distance after each round
+
+    with Parallel(n_jobs=n_workers) as parallel:
+        for round_idx in range(n_rounds):
+            done = round_idx * sync_every
+            counts = [min(sync_every, quota - done) for quota in quotas]
+            counts = [count for count in counts if count > 0]
+            seeds = rng.integers(2**32, size=len(counts))
+            results = parallel(
+                delayed(run_episodes)(
+                    instance_data, count, q_table, epsilon, s, agent_params
+                )
+                for count, s in zip(counts, seeds)
+            )
+
+            q_table = merge_q_tables([result[0] for result in results])
+            epsilon = results[0][1]  # The first worker always runs the most episodes
+            for _, _, distance, route in results:
+                if distance < best_distance:
+                    best_distance = distance
+                    best_route = route
+            best_distances.append(best_distance)
+
+            print(
+                f"Round {round_idx + 1}/{n_rounds} | epsilon: {epsilon:.3f} | "
+                f"Q-table: {len(q_table)} | Best: {best_distance:.2f}"
+            )
+
+    return q_table, epsilon, best_distance, best_route, best_distances
@@ -1,17 +1,44 @@
-import random
+import numba as nb
 import numpy as np
 
+_NO_MOVES = np.empty(0, dtype=np.int64)  # Next valid moves of a terminal state
+
+
+@nb.njit(cache=True)
+def _q_backward(q, state_idx, actions, rewards, next_idx, moves, offsets, lr, gamma):
+    """Apply the Q-learning update rule to an episode's transitions, last first.
+
+    Transition t updates q[state_idx[t], actions[t]], bootstrapping from row
+    next_idx[t] over the next valid moves moves[offsets[t]:offsets[t + 1]].
+    """
+    for t in range(actions.size - 1, -1, -1):
+        next_max_q = 0.0  # Terminal state
+        if offsets[t + 1] > offsets[t]:
+            next_q_row = q[next_idx[t]]
+            next_max_q = next_q_row[moves[offsets[t]]]
+            for i in range(offsets[t] + 1, offsets[t + 1]):
+                if next_q_row[moves[i]] > next_max_q:
+                    next_max_q = next_q_row[moves[i]]
+
+        row, action = state_idx[t], actions[t]
+        current_q = q[row, action]
+        q[row, action] = current_q + lr * (rewards[t] + gamma * next_max_q - current_q)
+
 
 class QLearningAgent:
     def __init__(
         self,
+        n_actions,
         learning_rate=0.1,
         discount_factor=0.95,
         epsilon=1.0,
         epsilon_decay=0.995,
         epsilon_min=0.01,
+        seed=None,
     ):
-        self.q_table = {}
+        self.n_actions = n_actions
+        self.q_table = {}  # state -> array of Q-values indexed by action
+        self.buffer = []  # Transitions of the current episode
         self.lr = learning_rate
         self.gamma = discount_factor
         self.epsilon = epsilon
@@ -22,29 +49,34 @@ class QLearningAgent:
         self.consecutive_same_actions = 0
         self.max_consecutive_actions = 3  # Maximum allowed consecutive same actions
         self.env = None  # Reference to environment
+        self.rng = np.random.default_rng(seed)  # Single RNG for all sampling
 
     def set_environment(self, env):
         """Set reference to environment for accessing valid moves."""
         self.env = env
 
+    def get_q_values(self, state):
+        """Get Q-values of all actions for state, initialize if not exists."""
+        q_row = self.q_table.get(state)
+        if q_row is None:
+            q_row = self.q_table[state] = np.zeros(self.n_actions, dtype=np.float32)
+        return q_row
+
     def get_q_value(self, state, action):
         """Get Q-value for state-action pair, initialize if not exists."""
-        if state not in self.q_table:
-            self.q_table[state] = {}
-        if action not in self.q_table[state]:
-            self.q_table[state][action] = 0.0
-        return self.q_table[state][action]
+        return self.get_q_values(state)[action]
 
     def choose_action(self, state, valid_moves):
         """Choose action using epsilon-greedy policy."""
         self.total_actions += 1
 
-        if not valid_moves:
+        valid_moves = np.asarray(valid_moves)
+        if len(valid_moves) == 0:
             return None
 
         # Exploration
-        if np.random.random() < self.epsilon:
-            action = random.choice(valid_moves)
+        if self.rng.random() < self.epsilon:
+            action = valid_moves[self.rng.integers(len(valid_moves))]
             self.consecutive_same_actions = (
                 0 if action != self.last_action else self.consecutive_same_actions + 1
             )
@@ -52,16 +84,13 @@ class QLearningAgent:
             return action
 
         # Exploitation
-        q_values = {action: self.get_q_value(state, action) for action in valid_moves}
+        q_values = self.get_q_values(state)[valid_moves]
 
         # Penalize actions that have been repeated too many times
-        if (
-            self.last_action in q_values
-            and self.consecutive_same_actions >= self.max_consecutive_actions
-        ):
-            q_values[self.last_action] -= 1000  # Large penalty for too many repeats
+        if self.consecutive_same_actions >= self.max_consecutive_actions:
+            q_values[valid_moves == self.last_action] -= 1000  # Large penalty
 
-        best_action = max(q_values.items(), key=lambda x: x[1])[0]
+        best_action = valid_moves[np.argmax(q_values)]
 
         # Update consecutive action counter
         self.consecutive_same_actions = (
@@ -72,26 +101,55 @@ class QLearningAgent:
         return best_action
 
     def update(self, state, action, reward, next_state, next_valid_moves):
-        """Update Q-values using Q-learning update rule."""
-        if not next_valid_moves:  # Terminal state
-            next_max_q = 0
-        else:
-            next_q_values = [
-                self.get_q_value(next_state, next_action)
-                for next_action in next_valid_moves
-            ]
-            next_max_q = max(next_q_values) if next_q_values else 0
-
-        # Get current Q-value
-        current_q = self.get_q_value(state, action)
-
-        # Q-learning update rule
-        new_q = current_q + self.lr * (reward + self.gamma * next_max_q - current_q)
-
-        # Update Q-table
-        if state not in self.q_table:
-            self.q_table[state] = {}
-        self.q_table[state][action] = new_q
+        """Record a transition, Q-values are updated in end_episode."""
+        if action is None or not 0 <= action < self.n_actions:
+            return  # No valid move existed, there is no Q-value to update
+        if next_valid_moves is None:  # Terminal state
+            next_valid_moves = _NO_MOVES
+        self.buffer.append((state, action, reward, next_state, next_valid_moves))
+
+    def end_episode(self):
+        """Apply the Q-learning update rule to the episode's transitions."""
+        if not self.buffer:
+            return
+        states, actions, rewards, next_states, next_moves = zip(*self.buffer)
+        n = len(states)
+
+        # Gather the Q-value rows involved, terminal next states need none
+        row_states = dict.fromkeys(states)
+        for next_state, moves in zip(next_states, next_moves):
+            if len(moves):
+                row_states[next_state] = None
+        row_states = list(row_states)
+        row_idx = {state: i for i, state in enumerate(row_states)}
+        q_rows = [self.get_q_values(state) for state in row_states]
+        q = np.array(q_rows)
+        state_idx = np.fromiter(map(row_idx.get, states), dtype=np.int64, count=n)
+        # Terminal next states have no row, their index is never read
+        next_idx = np.fromiter(
+            (row_idx.get(state, 0) for state in next_states), dtype=np.int64, count=n
+        )
+
+        # Next valid moves of every transition, concatenated with offsets
+        lengths = np.fromiter(map(len, next_moves), dtype=np.int64, count=n)
+        offsets = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+
+        # Walk backwards so the final reward propagates through the episode
+        _q_backward(
+            q,
+            state_idx,
+            np.asarray(actions, dtype=np.int64),
+            np.asarray(rewards, dtype=np.float64),
+            next_idx,
+            np.concatenate(next_moves).astype(np.int64, copy=False),
+            offsets,
+            self.lr,
+            self.gamma,
+        )
+        for q_row, updated in zip(q_rows, q):
+            q_row[:] = updated
+        self.buffer.clear()
 
     def decay_epsilon(self):
         """Decay exploration rate."""
@@ -0,0 +1,34 @@
+def run_episode(env, agent, best_distance=float("inf")):
+    """Run one training episode and apply its Q-value updates.
+
+    Returns the episode's distance, its number of moves, and its route if the
+    distance beats best_distance, otherwise None.
+    """
+    state = env.reset()
+    valid_moves = env.get_valid_moves()
+    done = False
+    moves = 0
+
+    while not done:
+        # Take action, also returns valid moves for next state
+        action = agent.choose_action(state, valid_moves)
+        next_state, reward, done, next_valid_moves = env.step(action)
+        agent.update(state, action, reward, next_state, next_valid_moves)
+
+        state = next_state
+        valid_moves = next_valid_moves
+        moves += 1
+
+    # Apply the episode's Q-value updates
+    agent.end_episode()
+
+    # The route is only built for a new best
+    distance = env.total_distance
+    route = None
+    if distance < best_distance:
+        route, _ = env.render_route()
+
+    # Decay exploration rate
+    agent.decay_epsilon()
+
+    return distance, moves, route
@@ -1,71 +1,150 @@
-import numpy as np
-import matplotlib.pyplot as plt
-from matplotlib.animation import FuncAnimation
-from colored import fg, attr
-import sys
+import mmap
 import os
+from functools import lru_cache
+
+import numpy as np
+
+
+def _euclidean_distance(point1, point2):
+    """Euclidean distance kernel, compiled by _euclidean_kernel."""
+    t0 = point1[0] - point2[0]
+    t1 = point1[1] - point2[1]
+    return np.sqrt(t0 * t0 + t1 * t1)
 
-# Add the src directory to the Python path
-# sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "src")))
 
-# from rl.env import CVRPEnv
-# from src.rl.q_learning import QLearningAgent
-# from src.utils import parse_vrp_file, parse_solution_file, plot_route
+@lru_cache(maxsize=None)
+def _euclidean_kernel():
+    """Compile euclidean_distance on first use, importing numba is slow."""
+    import numba as nb
+
+    return nb.njit(
+        "f8(f8[::1], f8[::1])",
+        fastmath=True,
+        cache=True,
+        locals={"t0": nb.f8, "t1": nb.f8},
+    )(_euclidean_distance)
 
 
 def euclidean_distance(point1, point2):
-    """Calculate Euclidean distance between two points."""
-    return np.sqrt((point1[0] - point2[0]) ** 2 + (point1[1] - point2[1]) ** 2)
+    """Calculate Euclidean distance between two contiguous float64 points."""
+    return _euclidean_kernel()(point1, point2)
+
+
+def get_distance_matrix(coords, squared=False):
+    """Return the matrix of Euclidean distances between all nodes, in node id order.
+
+    With squared=True the squared distances are returned instead. They rank
+    node pairs the same way and skip the square roots.
+    """
+    # Imported here so that importing utils stays cheap
+    from scipy.spatial.distance import pdist, squareform
+
+    pts = np.asarray([coords[k] for k in sorted(coords)], dtype=np.float64)
+    # Condensed upper triangle in one C loop, no (N, N, 2) intermediate
+    metric = "sqeuclidean" if squared else "euclidean"
+    return squareform(pdist(pts, metric))
+
+
+# Header fields used by the solver, mapped to the parser of their value
+_VRP_HEADER_FIELDS = {b"CAPACITY": int, b"DIMENSION": int}
+
+
+def _parse_header(header):
+    """Parse the "KEY : value" lines before the first section in one pass."""
+    fields = {}
+    for line in header.splitlines():
+        parts = line.replace(b":", b" ", 1).split(None, 1)
+        if len(parts) == 2:
+            parse = _VRP_HEADER_FIELDS.get(parts[0])
+            if parse is not None:
+                fields[parts[0].decode()] = parse(parts[1])
+    return fields
+
+
+def _load_section(mm, header_pos, end_pos, n_cols, n_rows=None):
+    """Parse the numeric rows between a section header and end_pos into an array."""
+    body_start = mm.find(b"\n", header_pos) + 1
+    tokens = mm[body_start:end_pos].split()
+    if n_rows is None:  # No DIMENSION header, infer from the token count
+        n_rows = len(tokens) // n_cols
+    if len(tokens) != n_rows * n_cols:
+        raise ValueError("Failed to parse all required data from VRP file")
+    values = np.fromiter(tokens, dtype=np.float64, count=len(tokens))
+    return values.reshape(n_rows, n_cols)
 
 
 def parse_vrp_file(filepath):
-    """Parse a VRP instance file and return problem data."""
-    coords = {}
-    demands = {}
-    capacity = None
+    """Parse a VRP instance file and return problem data.
+
+    Results are cached per file path and modification time, so the returned
+    dicts are shared between calls and must not be mutated.
+    """
+    return _parse_vrp_file(filepath, os.path.getmtime(filepath))
+
+
+@lru_cache(maxsize=32)
+def _parse_vrp_file(filepath, mtime):
+    """Parse a VRP instance file, cached on (filepath, mtime)."""
     depot_id = 1  # Depot is always node 1 in these instances
 
-    with open(filepath, "r") as file:
-        lines = file.readlines()
-
-    # Parse file line by line
-    i = 0
-    while i < len(lines):
-        line = lines[i].strip()
-
-        if line.startswith("CAPACITY"):
-            capacity = int(line.split()[-1])
-
-        elif line.startswith("NODE_COORD_SECTION"):
-            i += 1
-            while i < len(lines) and not lines[i].strip().startswith("DEMAND_SECTION"):
-                parts = lines[i].strip().split()
-                if len(parts) == 3:  # Valid coordinate line
-                    node_id = int(parts[0])
-                    coords[node_id] = (float(parts[1]), float(parts[2]))
-                i += 1
-            i -= 1  # Back up one line since we'll increment at end of loop
-
-        elif line.startswith("DEMAND_SECTION"):
-            i += 1
-            while i < len(lines) and not lines[i].strip().startswith("DEPOT_SECTION"):
-                parts = lines[i].strip().split()
-                if len(parts) == 2:  # Valid demand line
-                    node_id = int(parts[0])
-                    demands[node_id] = float(parts[1])
-                i += 1
-            i -= 1  # Back up one line since we'll increment at end of loop
-
-        i += 1
-
-    if not coords or not demands or capacity is None:
+    with open(filepath, "rb") as file, mmap.mmap(
+        file.fileno(), 0, access=mmap.ACCESS_READ
+    ) as mm:
+        # Locate the section markers
+        coord_pos = mm.find(b"NODE_COORD_SECTION")
+        demand_pos = mm.find(b"DEMAND_SECTION")
+        if -1 in (coord_pos, demand_pos):
+            raise ValueError("Failed to parse all required data from VRP file")
+        # The demand section ends at the next keyword, or at the end of the file
+        demand_end = mm.find(b"DEPOT_SECTION", demand_pos)
+        if demand_end == -1:
+            demand_end = mm.find(b"EOF", demand_pos)
+        if demand_end == -1:
+            demand_end = len(mm)
+
+        header = _parse_header(mm[:coord_pos])
+        if "CAPACITY" not in header:
+            raise ValueError("Failed to parse all required data from VRP file")
+        capacity = header["CAPACITY"]
+        # Rows are (id, x, y) and (id, demand), one per node
+        dimension = header.get("DIMENSION")
+        coord_rows = _load_section(mm, coord_pos, demand_pos, 3, dimension)
+        demand_rows = _load_section(mm, demand_pos, demand_end, 2, dimension)
+
+    # Build the dicts from whole columns, node ids converted in one cast
+    coord_ids = coord_rows[:, 0].astype(np.int64).tolist()
+    coords = dict(zip(coord_ids, map(tuple, coord_rows[:, 1:].tolist())))
+    demand_ids = demand_rows[:, 0].astype(np.int64).tolist()
+    demands = dict(zip(demand_ids, demand_rows[:, 1].tolist()))
+
+    if not coords or not demands:
         raise ValueError("Failed to parse all required data from VRP file")
 
     return coords, demands, capacity, depot_id
 
 
+def coords_to_array(coords):
+    """Convert a coords dict to a contiguous array with one row per node id."""
+    if isinstance(coords, np.ndarray):  # Already converted
+        return coords
+    pts = np.zeros((max(coords) + 1, 2), dtype=np.float64)
+    for node_id, coord in coords.items():
+        pts[node_id] = coord
+    return pts
+
+
 def parse_solution_file(filepath):
-    """Parse a solution file and return the optimal route and distance."""
+    """Parse a solution file and return the optimal route and distance.
+
+    Results are cached like parse_vrp_file, the returned routes must not be
+    mutated.
+    """
+    return _parse_solution_file(filepath, os.path.getmtime(filepath))
+
+
+@lru_cache(maxsize=32)
+def _parse_solution_file(filepath, mtime):
+    """Parse a solution file, cached on (filepath, mtime)."""
     routes = []
     total_distance = None
 
@@ -73,19 +152,16 @@ def parse_solution_file(filepath):
         content = file.read()
 
     # Split content into lines and process each line
-    for line in content.strip().split("\n"):
+    for line in content.splitlines():
         line = line.strip()
         if not line:  # Skip empty lines
             continue
         if line.startswith("Route"):
             # Extract numbers after the colon
-            numbers = line.split(":")[1].strip()
-            # Add depot at start and end of each route
-            route = [int(x) for x in numbers.split()]
+            route = [int(x) for x in line.partition(":")[2].split()]
             routes.append(route)
         elif line.startswith("cost"):  # Get cost line
-            cost_str = line.split()[1]  # Get the number after "cost"
-            total_distance = float(cost_str)
+            total_distance = float(line.rsplit(None, 1)[-1])  # Number after "cost"
 
     return routes, total_distance
 
@@ -103,6 +179,9 @@ def plot_route(
     current_step=None,
 ):
     """Plot a route with optional animation support."""
+    # Coordinates as an array indexed by node id
+    pts = coords_to_array(coords)
+
     # Define a list of distinct colors for different routes
     route_colors = ["blue", "red", "orange", "green", "purple"]
 
@@ -110,30 +189,21 @@ def plot_route(
     ax.grid(True, linestyle="--", alpha=0.7)
 
     if not animated:
-        # Split route into individual routes (separated by depot)
-        routes = []
-        current_route = []
-        for node in route:
-            if node == depot_id:
-                if current_route:  # End of a route
-                    current_route.append(node)  # Add closing depot
-                    routes.append(current_route)
-                    current_route = [node]  # Start new route with depot
-                else:  # Start of first route
-                    current_route = [node]
-            else:
-                current_route.append(node)
-        # Add the last route if it exists
-        if current_route and len(current_route) > 1:
-            if current_route[-1] != depot_id:
-                current_route.append(depot_id)
-            routes.append(current_route)
+        # Split route into individual routes at depot visits, each one
+        # starting and ending at the depot
+        route_arr = np.asarray(route, dtype=np.int64)
+        routes = [
+            np.concatenate(([depot_id], sub[sub != depot_id], [depot_id]))
+            for sub in np.split(route_arr, np.flatnonzero(route_arr == depot_id))
+            if np.any(sub != depot_id)  # Skip segments without customers
+        ]
 
         # Plot each route with a different color and style
         for i, r in enumerate(routes):
             # Extract x and y coordinates for this route
-            x = [coords[node][0] for node in r]
-            y = [coords[node][1] for node in r]
+            xy = pts[r]
+            x, y = xy[:, 0], xy[:, 1]
+            route_color = route_colors[i % len(route_colors)]
 
             # Use dashed lines for depot connections
             linestyle = "--" if depot_id in r else "-"
@@ -142,31 +212,34 @@ def plot_route(
             ax.plot(
                 x,
                 y,
-                color=route_colors[i % len(route_colors)],
+                color=route_color,
                 marker="o",
                 linestyle=linestyle,
                 label=f"Route {i+1}",
                 zorder=2,
             )
 
-            # Add arrows to show direction
-            for j in range(len(x) - 1):
-                ax.annotate(
-                    "",
-                    xy=(x[j + 1], y[j + 1]),
-                    xytext=(x[j], y[j]),
-                    arrowprops=dict(
-                        arrowstyle="->",
-                        color=route_colors[i % len(route_colors)],
-                        lw=1.5,
-                    ),
-                )
+            # Add arrows to show direction, one quiver artist per route
+            ax.quiver(
+                x[:-1],
+                y[:-1],
+                np.diff(x),
+                np.diff(y),
+                color=route_color,
+                angles="xy",
+                scale_units="xy",
+                scale=1,
+                width=0.003,
+                headwidth=5,
+                headlength=7,
+                zorder=3,
+            )
 
     else:
         # For animation, plot up to current_step
         if current_step is not None and current_step < len(route):
-            x = [coords[node][0] for node in route[: current_step + 1]]
-            y = [coords[node][1] for node in route[: current_step + 1]]
+            xy = pts[np.asarray(route[: current_step + 1], dtype=np.int64)]
+            x, y = xy[:, 0], xy[:, 1]
             ax.plot(x, y, marker="o", color=color)
             # Add a different marker for the current node
             ax.plot(x[-1], y[-1], marker="*", color="red", markersize=12)
@@ -174,19 +247,20 @@ def plot_route(
     # Plot depot with a different marker
     if depot_id is not None:
         ax.plot(
-            coords[depot_id][0],
-            coords[depot_id][1],
+            pts[depot_id, 0],
+            pts[depot_id, 1],
             marker="s",
             color="black",
             markersize=10,
             zorder=3,
         )
 
-    # Add node labels
-    for node in route:
+    # Add node labels, once per node even if it is visited repeatedly
+    nodes = np.unique(np.asarray(route, dtype=np.int64))
+    for node, (x, y) in zip(nodes.tolist(), pts[nodes].tolist()):
         ax.text(
-            coords[node][0],
-            coords[node][1],
+            x,
+            y,
             str(node),
             fontsize=9,
             ha="right",
@@ -220,27 +294,54 @@ def plot_route(
         )
 
 
-def create_route_animation(coords, route_history, depot_id):
+def create_route_animation(coords, route_history, depot_id, color="blue"):
     """Create an animation of route construction."""
+    # Imported here so that parsing and training never load matplotlib
+    import matplotlib.pyplot as plt
+    from matplotlib.animation import FuncAnimation
+
     fig, ax = plt.subplots(figsize=(8, 6))
+    pts = coords_to_array(coords)
+    route_history = [np.asarray(route, dtype=np.int64) for route in route_history]
+
+    # Static artists are drawn once and kept in the blit background
+    ax.grid(True, linestyle="--", alpha=0.7)
+    ax.set_title("Route Construction")
+    ax.plot(
+        pts[depot_id, 0],
+        pts[depot_id, 1],
+        marker="s",
+        color="black",
+        markersize=10,
+        zorder=3,
+    )
+    nodes = np.unique(np.concatenate(route_history + [[depot_id]]))
+    for node in nodes:
+        ax.text(
+            pts[node, 0],
+            pts[node, 1],
+            str(node),
+            fontsize=9,
+            ha="right",
+            va="bottom",
+        )
+    ax.update_datalim(pts[nodes])
+    ax.autoscale_view()
+
+    # Animated artists, only their data changes between frames
+    (route_line,) = ax.plot([], [], marker="o", color=color)
+    (current_line,) = ax.plot([], [], marker="*", color="red", markersize=12)
 
     def init():
-        ax.clear()
-        return (ax,)
+        route_line.set_data([], [])
+        current_line.set_data([], [])
+        return route_line, current_line
 
     def update(frame):
-        ax.clear()
-        route = route_history[frame]
-        plot_route(
-            coords,
-            route,
-            "Route Construction",
-            ax,
-            depot_id=depot_id,
-            animated=True,
-            current_step=len(route) - 1,
-        )
-        return (ax,)
+        xy = pts[route_history[frame]]
+        route_line.set_data(xy[:, 0], xy[:, 1])
+        current_line.set_data(xy[-1:, 0], xy[-1:, 1])  # Current node
+        return route_line, current_line
 
     anim = FuncAnimation(
         fig,